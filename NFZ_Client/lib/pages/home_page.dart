@@ -21,6 +21,7 @@ class _HomePageState extends State<HomePage> {
   List<dynamic> userMessages = [];
   List<dynamic> emailMessages = [];
   final TextEditingController _controller = TextEditingController();
+  DateTime? _fetchBlockedUntil;
 
   String get displayUsername {
     final parts = widget.username.split('@');
@@ -58,28 +59,37 @@ class _HomePageState extends State<HomePage> {
   }
 
   /// Fetch emails from Gmail via the server.
+  /// When the server is rate limiting or busy, the stored emails are still shown
+  /// and no new fetch is requested until its Retry-After delay has passed.
   Future<void> _fetchEmailMessages() async {
     try {
-      final fetchResponse = await http.post(
-        Uri.parse('$serverUrl/fetch_emails'),
-        headers: {'Content-Type': 'application/json'},
-        body: jsonEncode({'username': widget.username}),
-      );
-
-      if (fetchResponse.statusCode == 200) {
-        final emailsResponse = await http.get(
-          Uri.parse('$serverUrl/get_emails?username=${widget.username}'),
+      if (_fetchBlockedUntil == null || DateTime.now().isAfter(_fetchBlockedUntil!)) {
+        final fetchResponse = await http.post(
+          Uri.parse('$serverUrl/fetch_emails'),
+          headers: {'Content-Type': 'application/json'},
+          body: jsonEncode({'username': widget.username}),
         );
-        if (emailsResponse.statusCode == 200) {
-          setState(() {
-            emailMessages = jsonDecode(emailsResponse.body);
-          });
-          print("Fetched emails: ${emailsResponse.body}");
-        } else {
-          print("[ERROR] Get emails failed: ${emailsResponse.body}");
+
+        if (fetchResponse.statusCode == 429 || fetchResponse.statusCode == 503) {
+          final retryAfter = int.tryParse(fetchResponse.headers['retry-after'] ?? '') ?? 30;
+          _fetchBlockedUntil = DateTime.now().add(Duration(seconds: retryAfter));
+          print("[WARNING] Fetch emails deferred for ${retryAfter}s: ${fetchResponse.body}");
+        } else if (fetchResponse.statusCode != 200) {
+          print("[ERROR] Fetch emails failed: ${fetchResponse.body}");
+          return;
         }
+      }
+
+      final emailsResponse = await http.get(
+        Uri.parse('$serverUrl/get_emails?username=${widget.username}'),
+      );
+      if (emailsResponse.statusCode == 200) {
+        setState(() {
+          emailMessages = jsonDecode(emailsResponse.body);
+        });
+        print("Fetched emails: ${emailsResponse.body}");
       } else {
-        print("[ERROR] Fetch emails failed: ${fetchResponse.body}");
+        print("[ERROR] Get emails failed: ${emailsResponse.body}");
       }
     } catch (e) {
       print("[EXCEPTION] Failed to fetch emails: $e");
@@ -113,14 +123,15 @@ class _HomePageState extends State<HomePage> {
   }
 
   /// Delete a user-predicted message.
-  Future<void> _deleteMessage(String messageText) async {
+  Future<void> _deleteMessage(dynamic message) async {
     try {
       final response = await http.post(
         Uri.parse('$serverUrl/delete_message'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({
           'username': widget.username,
-          'text': messageText,
+          'id': message['id'],
+          'text': message['text'],
         }),
       );
 
@@ -135,20 +146,21 @@ class _HomePageState extends State<HomePage> {
   }
 
   /// Delete an email from the email list.
-  Future<void> _deleteEmail(String emailText) async {
+  Future<void> _deleteEmail(dynamic email) async {
     try {
       final response = await http.post(
         Uri.parse('$serverUrl/delete_email'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({
           'username': widget.username,
-          'text': emailText,
+          'id': email['id'],
+          'text': email['message'],
         }),
       );
 
       if (response.statusCode == 200) {
         setState(() {
-          emailMessages.removeWhere((email) => email['message'] == emailText);
+          emailMessages.removeWhere((e) => e['id'] == email['id']);
         });
       } else {
         print("[ERROR] Delete email failed: ${response.body}");
@@ -194,7 +206,7 @@ class _HomePageState extends State<HomePage> {
         ),
         trailing: IconButton(
           icon: const Icon(Icons.delete, color: Colors.grey),
-          onPressed: () => _deleteMessage(message['text']),
+          onPressed: () => _deleteMessage(message),
         ),
       ),
     );
@@ -236,7 +248,7 @@ class _HomePageState extends State<HomePage> {
         ),
         trailing: IconButton(
           icon: const Icon(Icons.delete, color: Colors.grey),
-          onPressed: () => _deleteEmail(email['message']),
+          onPressed: () => _deleteEmail(email),
         ),
       ),
     );
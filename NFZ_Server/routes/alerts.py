@@ -1,15 +1,19 @@
 from flask import Blueprint, request, jsonify
+from utils.store import RecordList, AlertRecord
 
 alerts_bp = Blueprint('alerts', __name__)
 
-shared_alerts = []
+MAX_SHARED_ALERTS = 10000
+MAX_ALERT_AGE = 30 * 24 * 3600
+
+shared_alerts = RecordList('shared_alerts', MAX_SHARED_ALERTS, MAX_ALERT_AGE)
 
 @alerts_bp.route('/alerts', methods=['GET'])
 def get_alerts():
     """
     Retrieve a list of all shared alerts.
     """
-    return jsonify(shared_alerts)
+    return jsonify([alert.to_dict() for alert in shared_alerts])
 
 @alerts_bp.route('/alerts', methods=['POST'])
 def post_alert():
@@ -24,9 +28,5 @@ def post_alert():
     if not username or not message:
         return jsonify({'error': 'Missing username or message'}), 400
 
-    alert = {
-        'username': username,
-        'message': message
-    }
-    shared_alerts.append(alert)
+    shared_alerts.append(AlertRecord(username, message))
     return jsonify({'status': 'Alert shared successfully'}), 201
@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
 import datetime
 from utils.encryption_util import decrypt_text
+from utils.store import RecordList, ChatRecord
 
 chat_bp = Blueprint('chat', __name__)
 
-chat_messages = []
+MAX_CHAT_MESSAGES = 10000
+MAX_CHAT_AGE = 7 * 24 * 3600
+
+chat_messages = RecordList('chat_messages', MAX_CHAT_MESSAGES, MAX_CHAT_AGE)
 
 @chat_bp.route('/send_message', methods=['POST'])
 def send_message():
@@ -21,11 +25,7 @@ def send_message():
                 return jsonify({'status': 'error', 'message': 'Message too long'}), 400
 
             timestamp = datetime.datetime.now().isoformat()
-            chat_messages.append({
-                'username': username,
-                'message': message,
-                'timestamp': timestamp,
-            })
+            chat_messages.append(ChatRecord(username, message, timestamp))
             return jsonify({'status': 'ok', 'message': 'Message sent successfully'}), 200
 
         return jsonify({'status': 'error', 'message': 'Invalid request'}), 400
@@ -40,7 +40,7 @@ def get_chat_messages():
     """
     decrypted_messages = []
     for msg in chat_messages:
-        decrypted_msg = msg.copy()
-        decrypted_msg['message'] = decrypt_text(msg['message']) or msg['message']
+        decrypted_msg = msg.to_dict()
+        decrypted_msg['message'] = decrypt_text(msg.message) or msg.message
         decrypted_messages.append(decrypted_msg)
     return jsonify(decrypted_messages)
@@ -1,12 +1,19 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
-from services.model import load_model_and_vectorizer, predict_phishing
+from services.model import get_active_model, get_linear_model, predict_phishing, cascade_stats
 from services.fetch_emails import fetch_gmail_periodically, fetch_gmail_once
+from services.online_learning import record_feedback, run_online_updates, pending_feedback_count, update_stats
 from routes.auth import auth_bp
 from routes.chat import chat_bp
 from routes.chat import chat_messages
 from utils.encryption_util import encrypt_text
+from utils.database import content_id
+from utils.tombstones import add_tombstone, text_tombstone_id, load_tombstones
+from utils.store import UserStore, MessageRecord, ChatRecord, stores, evict_expired_periodically
+from utils.admission import (RateLimiter, BoundedExecutor, SingleFlight, Overloaded, RateLimited,
+                             rate_limited, overloaded, too_many_requests)
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import services.fetch_emails as fetch_emails
 
 import time
@@ -21,12 +28,40 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(chat_bp)
 
 # Load model and vectorizer
-model, vectorizer = load_model_and_vectorizer()
+get_active_model()
 
-# Data storage for users
-user_messages = {}
-user_emails = {}
-deleted_emails_by_user = {}
+# Load the emails users deleted so the fetcher keeps skipping them
+load_tombstones()
+
+MAX_MESSAGES_PER_USER = 500
+MAX_MESSAGES_TOTAL = 100000
+MAX_MESSAGE_AGE = 30 * 24 * 3600
+
+# Admission control for the expensive endpoints (rates are per second)
+PREDICT_USER_RATE, PREDICT_USER_BURST = 2, 10
+PREDICT_GLOBAL_RATE, PREDICT_GLOBAL_BURST = 50, 100
+FETCH_USER_RATE, FETCH_USER_BURST = 1 / 30, 2
+FETCH_GLOBAL_RATE, FETCH_GLOBAL_BURST = 1, 5
+INFERENCE_WORKERS, INFERENCE_QUEUE = 4, 32
+FETCH_WORKERS, FETCH_QUEUE = 2, 8
+FETCH_TIMEOUT = 120
+
+predict_limiter = RateLimiter(PREDICT_USER_RATE, PREDICT_USER_BURST, PREDICT_GLOBAL_RATE, PREDICT_GLOBAL_BURST)
+fetch_limiter = RateLimiter(FETCH_USER_RATE, FETCH_USER_BURST, FETCH_GLOBAL_RATE, FETCH_GLOBAL_BURST)
+inference_executor = BoundedExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE)
+# Concurrent fetches for the same user share one Gmail fetch, and only new fetches take a token
+fetch_flights = SingleFlight(BoundedExecutor(FETCH_WORKERS, FETCH_QUEUE), fetch_limiter)
+
+# Data storage for users, each keyed by username and then by item ID
+user_messages = UserStore('user_messages', MAX_MESSAGES_PER_USER, MAX_MESSAGES_TOTAL, MAX_MESSAGE_AGE)
+# The fetcher already skips deleted emails, so its store is served directly
+user_emails = fetch_emails.messages
+
+def normalize(s):
+    """
+    Collapse line breaks so texts sent back by clients match the stored ones.
+    """
+    return s.replace('\n', ' ').replace('\r', ' ').strip()
 
 def start_gmail_fetching():
     """
@@ -35,7 +70,22 @@ def start_gmail_fetching():
     thread = threading.Thread(target=fetch_gmail_periodically, daemon=True)
     thread.start()
 
+def start_online_updates():
+    """
+    Start a background thread that applies buffered user feedback to the model.
+    """
+    thread = threading.Thread(target=run_online_updates, daemon=True)
+    thread.start()
+
+def start_store_eviction():
+    """
+    Start a background thread that evicts expired items from the in-memory stores.
+    """
+    thread = threading.Thread(target=evict_expired_periodically, daemon=True)
+    thread.start()
+
 @app.route('/predict_message', methods=['POST'])
+@rate_limited(predict_limiter)
 def predict_message_route():
     """
     Classify a given message as phishing or not.
@@ -47,16 +97,19 @@ def predict_message_route():
     if not message.strip():
         return jsonify({"status": "error", "message": "Empty message"}), 400
 
-    label_numeric = predict_phishing(model, vectorizer, message)
+    model, vectorizer = get_active_model()
+    try:
+        future = inference_executor.submit(predict_phishing, model, vectorizer, message, get_linear_model())
+    except Overloaded:
+        return overloaded()
+    label_numeric = future.result()
     label_str = "phishing" if label_numeric == 1 else "not_phishing"
 
-    user_messages.setdefault(username, []).append({
-        "text": message,
-        "timestamp": time.time(),
-        "label": label_str
-    })
+    message_id = content_id(message)
+    # Re-submitting the same text replaces the earlier entry
+    user_messages.put(username, message_id, MessageRecord(message_id, message, time.time(), label_str))
 
-    return jsonify({"status": "ok", "label": label_str})
+    return jsonify({"status": "ok", "id": message_id, "label": label_str})
 
 @app.route('/send_chat_message', methods=['POST'])
 def send_chat_message():
@@ -72,11 +125,7 @@ def send_chat_message():
 
     encrypted_message = encrypt_text(message) or message
 
-    chat_messages.append({
-        "username": username,
-        "message": encrypted_message,
-        "timestamp": time.time()
-    })
+    chat_messages.append(ChatRecord(username, encrypted_message, time.time()))
 
     return jsonify({"status": "ok"})
 
@@ -86,25 +135,24 @@ def get_messages():
     Retrieve all messages for a specific user, sorted by timestamp.
     """
     username = request.args.get("username", "")
-    messages_for_user = user_messages.get(username, [])
-    sorted_messages = sorted(messages_for_user, key=lambda x: x['timestamp'], reverse=True)
-    return jsonify(sorted_messages)
+    messages_for_user = user_messages.values(username)
+    sorted_messages = sorted(messages_for_user, key=lambda x: x.timestamp, reverse=True)
+    return jsonify([msg.to_dict() for msg in sorted_messages])
 
 @app.route('/delete_message', methods=['POST'])
 def delete_message():
     """
-    Delete a specific message for a user.
+    Delete a specific message for a user, identified by its ID or, for older clients, its text.
     """
     data = request.get_json()
     username = data.get("username", "")
-    text = data.get("text", "")
+    message_id = data.get("id") or content_id(data.get("text", ""))
 
-    original_length = len(user_messages.get(username, []))
-    user_messages[username] = [
-        msg for msg in user_messages.get(username, []) if msg["text"] != text
-    ]
+    deleted = user_messages.pop(username, message_id)
 
-    if len(user_messages[username]) < original_length:
+    if deleted:
+        # A deleted message was labelled wrongly, so feed back the opposite label
+        record_feedback(deleted.text, 0 if deleted.label == "phishing" else 1)
         return jsonify({"status": "ok"})
     else:
         return jsonify({"status": "error", "message": "Message not found"}), 404
@@ -113,6 +161,7 @@ def delete_message():
 def fetch_emails_route():
     """
     Fetch emails from Gmail and assign them to a user, excluding deleted ones.
+    A request arriving while a fetch for the same user is running waits for that fetch.
     """
     data = request.get_json()
     username = data.get("username", "")
@@ -120,17 +169,12 @@ def fetch_emails_route():
     if not username:
         return jsonify({"status": "error", "message": "Username is required"}), 400
 
-    fetch_gmail_once(username)
-
-    deleted_set = deleted_emails_by_user.get(username, set())
-
-    def normalize(s):
-        return s.replace('\n', ' ').replace('\r', ' ').strip()
-
-    user_emails[username] = [
-        msg for msg in fetch_emails.messages.get(username, [])
-        if isinstance(msg, dict) and normalize(msg.get("message", "")) not in deleted_set
-    ]
+    try:
+        fetch_flights.submit(username, fetch_gmail_once, username).result(timeout=FETCH_TIMEOUT)
+    except RateLimited as e:
+        return too_many_requests(e.retry_after)
+    except (Overloaded, FutureTimeoutError):
+        return overloaded()
 
     return jsonify({"status": "ok", "message": "Emails fetched successfully"})
 
@@ -140,35 +184,61 @@ def get_emails():
     Retrieve all emails for a specific user.
     """
     username = request.args.get("username", "")
-    emails_for_user = user_emails.get(username, [])
-    return jsonify(emails_for_user)
+    emails_for_user = user_emails.values(username)
+    return jsonify([email.to_dict() for email in emails_for_user])
 
 @app.route('/delete_email', methods=['POST'])
 def delete_email():
     """
-    Mark an email as deleted for a user.
+    Mark an email as deleted for a user, identified by its ID or, for older clients, its text.
+    The ID is remembered so the fetcher never downloads the email again.
     """
     data = request.get_json()
     username = data.get("username", "")
+    email_id = data.get("id", "")
     text = data.get("text", "")
 
-    def normalize(s):
-        return s.replace('\n', ' ').replace('\r', ' ').strip()
+    if not username or not (email_id or text):
+        return jsonify({"status": "error", "message": "Username and id or text are required"}), 400
 
-    if not username or not text:
-        return jsonify({"status": "error", "message": "Username and text are required"}), 400
+    if not email_id:
+        email_id = next((email.id for email in user_emails.values(username)
+                         if normalize(email.message) == normalize(text)), None)
+        if email_id is None:
+            # Not stored (yet), so remember the text for the fetcher to skip it
+            add_tombstone(username, text_tombstone_id(text))
+            return jsonify({"status": "ok"})
 
-    deleted_emails_by_user.setdefault(username, set()).add(normalize(text))
+    add_tombstone(username, email_id)
+    deleted = user_emails.pop(username, email_id)
 
-    original_emails = user_emails.get(username, [])
-    user_emails[username] = [
-        email for email in original_emails
-        if normalize(email.get("message", "")) != normalize(text)
-    ]
+    if deleted and deleted.result in ("phishing", "not_phishing"):
+        record_feedback(deleted.message, 0 if deleted.result == "phishing" else 1)
 
     return jsonify({"status": "ok"})
 
+@app.route('/model_status', methods=['GET'])
+def model_status():
+    """
+    Report the state of incremental model updates and how many messages took each cascade path.
+    """
+    return jsonify({
+        "status": "ok",
+        "pending_feedback": pending_feedback_count(),
+        "cascade": cascade_stats,
+        **update_stats,
+    })
+
+@app.route('/memory_usage', methods=['GET'])
+def memory_usage():
+    """
+    Report the number of items and estimated memory use of each in-memory store.
+    """
+    return jsonify({"status": "ok", "stores": {name: store.memory_usage() for name, store in stores.items()}})
+
 if __name__ == '__main__':
     print("[DEBUG] Starting Gmail background threads...")
     threading.Thread(target=start_gmail_fetching, daemon=True).start()
+    start_online_updates()
+    start_store_eviction()
     app.run(host='0.0.0.0', port=5000)
@@ -2,18 +2,34 @@ import time
 import base64
 import os
 import re
-import pickle
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 
+from services.model import get_active_model, get_linear_model, predict_phishing
+from utils.tombstones import is_tombstoned, text_tombstone_id
+from utils.store import UserStore, EmailRecord, IdSets
+
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
-messages = {}
-deleted_emails_by_user = {}
-_model = None
-_vectorizer = None
+MAX_SKIPPED_PER_USER = 1000
+MAX_SKIPPED_USERS = 10000
+MAX_SKIPPED_TOTAL = 1000000
+MAX_EMAILS_PER_USER = 1000
+MAX_EMAILS_TOTAL = 100000
+MAX_EMAIL_AGE = 30 * 24 * 3600
+
+def _skip_evicted(username, msg_id):
+    """
+    Remember an email evicted from the store, so the next fetch does not download it again.
+    """
+    _skipped_ids.add(username, msg_id)
+
+# Per-user emails keyed by Gmail message ID
+messages = UserStore('emails', MAX_EMAILS_PER_USER, MAX_EMAILS_TOTAL, MAX_EMAIL_AGE, on_evict=_skip_evicted)
+# Per-user Gmail IDs that were filtered out or evicted, so they are not downloaded again
+_skipped_ids = IdSets('skipped_email_ids', MAX_SKIPPED_PER_USER, MAX_SKIPPED_USERS, MAX_SKIPPED_TOTAL)
 
 def get_gmail_service():
     """
@@ -71,16 +87,29 @@ def should_ignore_text(text):
 
     return False
 
+def is_ignored_sender(sender):
+    """
+    Determine if messages from a sender should be ignored (automated and Google senders).
+    """
+    return 'no-reply@' in sender or 'google.com' in sender
+
 def extract_message_text(service, msg_id):
     """
     Extract and clean the text content of a Gmail message.
+    Returns None if the message could not be downloaded, so it is retried on the next fetch,
+    and an empty string if it was downloaded but should be ignored.
     """
     try:
         msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
+    except Exception as e:
+        print(f"[ERROR] Failed to download message {msg_id}: {e}")
+        return None
+
+    try:
         headers = msg.get('payload', {}).get('headers', [])
         sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
 
-        if 'no-reply@' in sender or 'google.com' in sender:
+        if is_ignored_sender(sender):
             return ""
 
         parts = msg.get('payload', {}).get('parts', [])
@@ -116,26 +145,48 @@ def classify_local_message(message):
     """
     Classify a local message using the pre-trained phishing detection model.
     """
-    global _model, _vectorizer
     try:
-        if _model is None or _vectorizer is None:
-            with open('models/phishing_model.pkl', 'rb') as f:
-                _model = pickle.load(f)
-            with open('models/vectorizer.pkl', 'rb') as f:
-                _vectorizer = pickle.load(f)
-
-        vec = _vectorizer.transform([message])
-        prediction = _model.predict(vec)[0]
+        model, vectorizer = get_active_model()
+        prediction = predict_phishing(model, vectorizer, message, get_linear_model())
         return "phishing" if int(prediction) == 1 else "not_phishing"
     except Exception as e:
         print(f"[ERROR] Local model prediction failed: {e}")
         return 'error'
 
+def fetch_new_messages(service, username):
+    """
+    Download, filter and classify the latest Gmail messages of a user.
+    Messages that are already stored, deleted or filtered out are skipped before downloading.
+    Returns the list of newly added email records.
+    """
+    message_ids = get_latest_messages(service)
+    print(f"[DEBUG] {len(message_ids)} messages fetched.")
+
+    new_messages = []
+    for msg in message_ids:
+        msg_id = msg['id']
+        if messages.contains(username, msg_id) or _skipped_ids.contains(username, msg_id) or is_tombstoned(username, msg_id):
+            continue
+
+        text = extract_message_text(service, msg_id)
+        if text is None:
+            continue
+        if not text.strip() or len(text) > 50 or is_tombstoned(username, text_tombstone_id(text)):
+            _skipped_ids.add(username, msg_id)
+            continue
+
+        result = classify_local_message(text)
+        record = EmailRecord(msg_id, text, result)
+        messages.put(username, msg_id, record)
+        new_messages.append(record)
+        print(f"[DEBUG] New email for {username}: {text[:30]}... → {result}")
+
+    return new_messages
+
 def fetch_gmail_periodically():
     """
     Continuously fetch Gmail messages in a background thread.
     """
-    global messages
     service = None
     username = "gmail_user"
 
@@ -147,28 +198,7 @@ def fetch_gmail_periodically():
                 print("[DEBUG] Gmail service connected.")
 
             print("[DEBUG] Fetching emails...")
-            message_ids = get_latest_messages(service)
-            print(f"[DEBUG] {len(message_ids)} messages fetched.")
-
-            if username not in messages:
-                messages[username] = []
-
-            deleted_set = deleted_emails_by_user.get(username, set())
-
-            for msg in message_ids:
-                text = extract_message_text(service, msg['id'])
-                if not text.strip() or len(text) > 50:
-                    continue
-
-                if any(m['message'] == text for m in messages[username]):
-                    continue
-
-                if text in deleted_set:
-                    continue
-
-                result = classify_local_message(text)
-                messages[username].append({'message': text, 'result': result})
-                print(f"[DEBUG] New email for {username}: {text[:30]}... → {result}")
+            fetch_new_messages(service, username)
 
         except Exception as e:
             print(f"[WARNING] Problem fetching Gmail messages: {e}")
@@ -180,37 +210,10 @@ def fetch_gmail_once(username):
     """
     Fetch Gmail messages once for a specific user.
     """
-    global messages
-
     try:
         print(f"[DEBUG] Fetching emails (manual request) for {username}...")
         service = get_gmail_service()
-        message_ids = get_latest_messages(service)
-        print(f"[DEBUG] {len(message_ids)} messages fetched manually.")
-
-        if username not in messages:
-            messages[username] = []
-
-        deleted_set = deleted_emails_by_user.get(username, set())
-
-        new_messages = []
-        for msg in message_ids:
-            text = extract_message_text(service, msg['id'])
-            if not text.strip() or len(text) > 50:
-                continue
-
-            if any(m['message'] == text for m in messages[username]):
-                continue
-
-            if text in deleted_set:
-                continue
-
-            result = classify_local_message(text)
-            message_entry = {'message': text, 'result': result}
-            messages[username].append(message_entry)
-            new_messages.append(message_entry)
-            print(f"[DEBUG] New email for {username}: {text[:30]}... → {result}")
-
+        new_messages = fetch_new_messages(service, username)
         print(f"[DEBUG] {len(new_messages)} new emails added manually for {username}.")
     except Exception as e:
         print(f"[ERROR] Manual Gmail fetch failed: {e}")
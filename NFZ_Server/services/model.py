@@ -1,7 +1,8 @@
 import os
+import json
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import classification_report, accuracy_score
@@ -9,31 +10,199 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.feature_extraction.text import TfidfVectorizer
 import pickle
+import threading
 import warnings
 
 warnings.filterwarnings('ignore')
 
+MODEL_FILE = "models/phishing_model.pkl"
+VECTORIZER_FILE = "models/vectorizer.pkl"
+HOLDOUT_FILE = "models/holdout.pkl"
+BASELINE_FILE = "models/baseline_accuracy.json"
+LINEAR_MODEL_FILE = "models/linear_model.pkl"
+# Models updated from user feedback are saved separately so the trained ones can be restored
+ONLINE_MODEL_FILE = "models/phishing_model_online.pkl"
+ONLINE_LINEAR_MODEL_FILE = "models/linear_model_online.pkl"
+
+# Messages whose linear phishing score falls inside this band are sent to the MLP
+CASCADE_ENABLED = True
+CASCADE_LOWER = 0.1
+CASCADE_UPPER = 0.9
+
+_active_model = None
+_active_vectorizer = None
+_active_lock = threading.Lock()
+
+_linear_model = None
+_linear_loaded = False
+
+cascade_stats = {"linear": 0, "mlp": 0}
+_stats_lock = threading.Lock()
+
 def load_model_and_vectorizer():
     """
-    Load the trained phishing detection model and vectorizer from pickle files.
+    Load the phishing detection model and vectorizer from pickle files.
+    The model updated from user feedback is preferred over the trained one if it exists.
     """
+    model_file = ONLINE_MODEL_FILE if os.path.exists(ONLINE_MODEL_FILE) else MODEL_FILE
     try:
-        with open("models/phishing_model.pkl", "rb") as f:
+        with open(model_file, "rb") as f:
             model = pickle.load(f)
-        with open("models/vectorizer.pkl", "rb") as f:
+        with open(VECTORIZER_FILE, "rb") as f:
             vectorizer = pickle.load(f)
         return model, vectorizer
     except Exception as e:
         print(f"[ERROR] Failed to load model/vectorizer: {e}")
         raise
 
-def predict_phishing(model, vectorizer, text):
+def get_active_model():
+    """
+    Return the (model, vectorizer) pair currently used for predictions, loading it on first use.
+    """
+    global _active_model, _active_vectorizer
+    with _active_lock:
+        if _active_model is None or _active_vectorizer is None:
+            _active_model, _active_vectorizer = load_model_and_vectorizer()
+        return _active_model, _active_vectorizer
+
+def set_active_model(model, vectorizer=None, linear_model=None):
+    """
+    Swap in a new model (and optionally vectorizer and linear pre-screen model)
+    for all subsequent predictions.
+    """
+    global _active_model, _active_vectorizer, _linear_model
+    with _active_lock:
+        _active_model = model
+        if vectorizer is not None:
+            _active_vectorizer = vectorizer
+        if linear_model is not None:
+            _linear_model = linear_model
+
+def get_linear_model():
+    """
+    Return the linear pre-screen model used by the cascade, or None if cascading is
+    disabled or the model has not been trained yet.
+    """
+    global _linear_model, _linear_loaded
+    if not CASCADE_ENABLED:
+        return None
+    with _active_lock:
+        if not _linear_loaded:
+            _linear_loaded = True
+            linear_file = ONLINE_LINEAR_MODEL_FILE if os.path.exists(ONLINE_LINEAR_MODEL_FILE) else LINEAR_MODEL_FILE
+            if os.path.exists(linear_file):
+                try:
+                    with open(linear_file, "rb") as f:
+                        linear_model = pickle.load(f)
+                    # A pre-screen that cannot learn from feedback would hide its mistakes
+                    # from the updated MLP, so older non-incremental models are not used
+                    if hasattr(linear_model, "partial_fit"):
+                        _linear_model = linear_model
+                    else:
+                        print("[WARNING] Linear model does not support partial_fit, cascade disabled. "
+                              "Retrain with services/model.py.")
+                except Exception as e:
+                    print(f"[ERROR] Failed to load linear model, cascade disabled: {e}")
+        return _linear_model
+
+def restore_trained_model():
+    """
+    Discard the models updated from user feedback and go back to the trained ones.
+    """
+    global _active_model, _active_vectorizer, _linear_model, _linear_loaded
+    for path in (ONLINE_MODEL_FILE, ONLINE_LINEAR_MODEL_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    with _active_lock:
+        _active_model = _active_vectorizer = _linear_model = None
+        _linear_loaded = False
+
+def save_model(model, path=ONLINE_MODEL_FILE):
+    """
+    Persist a model to disk so it survives a restart.
+    Writes to a temporary file first so a crash never leaves a truncated pickle behind.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+def load_holdout():
+    """
+    Load the (texts, labels) holdout set saved by the training script, or None if it is missing.
+    """
+    if not os.path.exists(HOLDOUT_FILE):
+        return None
+    try:
+        with open(HOLDOUT_FILE, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"[ERROR] Failed to load holdout set: {e}")
+        return None
+
+def load_baseline_accuracy():
+    """
+    Load the holdout accuracy of the originally trained model, or None if it was never recorded.
+    """
+    if not os.path.exists(BASELINE_FILE):
+        return None
+    try:
+        with open(BASELINE_FILE, "r") as f:
+            return json.load(f)["accuracy"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] Failed to load baseline accuracy: {e}")
+        return None
+
+def save_baseline_accuracy(accuracy):
+    """
+    Record the holdout accuracy that incremental updates are never allowed to fall far below.
+    """
+    with open(BASELINE_FILE, "w") as f:
+        json.dump({"accuracy": accuracy}, f)
+
+def predict_cascade(model, linear_model, vectorized, lower=None, upper=None):
+    """
+    Classify vectorized texts with the linear model first and send only those whose
+    phishing score falls inside the (lower, upper) band to the MLP.
+    Returns the predictions and the number of texts that were sent to the MLP.
+    """
+    lower = CASCADE_LOWER if lower is None else lower
+    upper = CASCADE_UPPER if upper is None else upper
+
+    scores = linear_model.predict_proba(vectorized)[:, 1]
+    predictions = (scores >= 0.5).astype(int)
+    uncertain = np.where((scores > lower) & (scores < upper))[0]
+    if len(uncertain):
+        predictions[uncertain] = model.predict(vectorized[uncertain])
+    return predictions, len(uncertain)
+
+def predict_phishing_batch(model, vectorizer, texts, linear_model=None):
+    """
+    Predict labels for many texts at once, which is much cheaper than one call per text.
+    If a linear model is given, the MLP is only consulted for uncertain texts.
+    """
+    vectorized = vectorizer.transform(texts)
+    if linear_model is None:
+        return model.predict(vectorized)
+
+    predictions, _ = predict_cascade(model, linear_model, vectorized)
+    return predictions
+
+def predict_phishing(model, vectorizer, text, linear_model=None):
     """
     Predict whether a given text is phishing or not using the loaded model and vectorizer.
+    If a linear model is given, the MLP is only consulted for uncertain texts.
     """
     vectorized = vectorizer.transform([text])
-    prediction = model.predict(vectorized)
-    return prediction[0]
+    if linear_model is None:
+        prediction = model.predict(vectorized)
+        return prediction[0]
+
+    predictions, mlp_count = predict_cascade(model, linear_model, vectorized)
+    with _stats_lock:
+        cascade_stats["mlp"] += mlp_count
+        cascade_stats["linear"] += len(predictions) - mlp_count
+    return predictions[0]
 
 if __name__ == "__main__":
     # Step 1: Load the dataset
@@ -101,14 +270,47 @@ if __name__ == "__main__":
     print(f"[MLP] Accuracy: {accuracy_score(y_test, mlp_predictions)}")
     print("\n" + "="*50 + "\n")
 
-    # Step 6: Save model and vectorizer
+    # Step 6: Cascade (linear pre-screen, MLP for uncertain messages)
+    # A log-loss SGDClassifier is used rather than the LogisticRegression above because it
+    # supports partial_fit, so user feedback can update it together with the MLP.
+    linear_model = SGDClassifier(loss="log_loss", random_state=42)
+    linear_model.fit(X_train_tfidf, y_train)
+    cascade_predictions, mlp_count = predict_cascade(mlp_model, linear_model, X_test_tfidf)
+    linear_count = len(cascade_predictions) - mlp_count
+
+    print("[Cascade] Classification Report:")
+    print(classification_report(y_test, cascade_predictions))
+    print(f"[Cascade] Uncertainty band: ({CASCADE_LOWER}, {CASCADE_UPPER})")
+    print(f"[Cascade] Linear only: {linear_count} ({linear_count / len(cascade_predictions):.1%}), "
+          f"sent to MLP: {mlp_count} ({mlp_count / len(cascade_predictions):.1%})")
+    print(f"[Cascade] Accuracy: {accuracy_score(y_test, cascade_predictions)} "
+          f"(MLP only: {accuracy_score(y_test, mlp_predictions)})")
+    print("\n" + "="*50 + "\n")
+
+    # Step 7: Save models and vectorizer
     try:
-        with open("models/phishing_model.pkl", "wb") as f:
+        with open(MODEL_FILE, "wb") as f:
             pickle.dump(mlp_model, f)
 
-        with open("models/vectorizer.pkl", "wb") as f:
+        with open(LINEAR_MODEL_FILE, "wb") as f:
+            pickle.dump(linear_model, f)
+
+        with open(VECTORIZER_FILE, "wb") as f:
             pickle.dump(vectorizer, f)
 
-        print("Model and vectorizer were saved successfully using pickle.")
+        # Held-out texts are used to validate incremental updates before they are swapped in
+        with open(HOLDOUT_FILE, "wb") as f:
+            pickle.dump((list(X_test), list(y_test)), f)
+
+        # Baseline of the configuration that serves requests
+        serving_predictions = cascade_predictions if CASCADE_ENABLED else mlp_predictions
+        save_baseline_accuracy(float(accuracy_score(y_test, serving_predictions)))
+
+        # Feedback applied to the previous models does not carry over to the new ones
+        for path in (ONLINE_MODEL_FILE, ONLINE_LINEAR_MODEL_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+
+        print("Models, vectorizer and holdout set were saved successfully using pickle.")
     except Exception as e:
         print(f"[ERROR] Failed to save model/vectorizer: {e}")
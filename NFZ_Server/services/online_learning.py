@@ -0,0 +1,151 @@
+import copy
+import time
+import threading
+
+from services.model import (get_active_model, get_linear_model, set_active_model, save_model,
+                            load_holdout, load_baseline_accuracy, save_baseline_accuracy,
+                            predict_phishing_batch, ONLINE_LINEAR_MODEL_FILE)
+
+# Both cascade models support partial_fit on the fixed TF-IDF vocabulary
+BATCH_SIZE = 32
+MAX_BUFFER_SIZE = 10000
+UPDATE_INTERVAL = 60
+MAX_ACCURACY_DROP = 0.01
+
+_feedback_buffer = []
+_buffer_lock = threading.Lock()
+_update_lock = threading.Lock()
+
+update_stats = {
+    "applied_batches": 0,
+    "rejected_batches": 0,
+    "applied_examples": 0,
+    "rejected_examples": 0,
+    "baseline_holdout_accuracy": None,
+    "last_update": None,
+    "last_holdout_accuracy": None,
+}
+
+def record_feedback(text, label):
+    """
+    Buffer a user-labelled example (1 = phishing, 0 = not phishing) for the next update.
+    The oldest examples are dropped once the buffer is full.
+    """
+    if not text or not text.strip():
+        return
+
+    with _buffer_lock:
+        _feedback_buffer.append((text, int(label)))
+        if len(_feedback_buffer) > MAX_BUFFER_SIZE:
+            del _feedback_buffer[:len(_feedback_buffer) - MAX_BUFFER_SIZE]
+
+def pending_feedback_count():
+    """
+    Return the number of buffered examples that have not been applied yet.
+    """
+    with _buffer_lock:
+        return len(_feedback_buffer)
+
+def evaluate_accuracy(model, vectorizer, texts, labels, linear_model=None):
+    """
+    Compute the accuracy of a model, or of the cascade if a linear model is given,
+    on a list of texts and labels.
+    """
+    if not texts:
+        return None
+    predictions = predict_phishing_batch(model, vectorizer, texts, linear_model)
+    correct = sum(1 for p, y in zip(predictions, labels) if int(p) == int(y))
+    return correct / len(labels)
+
+def get_baseline_accuracy(model, vectorizer, texts, labels, linear_model=None):
+    """
+    Return the holdout accuracy of the originally trained model.
+    If the training script did not record it, the model loaded first is measured and recorded,
+    so the baseline never moves with later updates, not even across restarts.
+    """
+    if update_stats["baseline_holdout_accuracy"] is None:
+        baseline = load_baseline_accuracy()
+        if baseline is None:
+            baseline = evaluate_accuracy(model, vectorizer, texts, labels, linear_model)
+            try:
+                save_baseline_accuracy(baseline)
+            except OSError as e:
+                print(f"[ERROR] Failed to save baseline accuracy: {e}")
+        update_stats["baseline_holdout_accuracy"] = baseline
+    return update_stats["baseline_holdout_accuracy"]
+
+def apply_pending_feedback(min_batch_size=1):
+    """
+    Apply buffered feedback to copies of the active model and linear pre-screen in mini-batches.
+    The copies are validated together, as the cascade that serves requests, against the holdout
+    set and only swapped in if their accuracy is no more than MAX_ACCURACY_DROP below the baseline
+    of the trained model, so a series of small losses cannot add up.
+    Without a holdout set the feedback is discarded, as it cannot be validated.
+    Returns True if a new model was swapped in.
+    """
+    with _update_lock:
+        with _buffer_lock:
+            if len(_feedback_buffer) < min_batch_size:
+                return False
+            batch = list(_feedback_buffer)
+            _feedback_buffer.clear()
+
+        holdout = load_holdout()
+        if holdout is None:
+            update_stats["rejected_batches"] += 1
+            update_stats["rejected_examples"] += len(batch)
+            print(f"[WARNING] No holdout set found, discarding {len(batch)} feedback examples. "
+                  f"Retrain with services/model.py to enable online updates.")
+            return False
+
+        start = time.time()
+        model, vectorizer = get_active_model()
+        linear_model = get_linear_model()
+        candidate = copy.deepcopy(model)
+        candidate_linear = copy.deepcopy(linear_model) if linear_model is not None else None
+
+        for i in range(0, len(batch), BATCH_SIZE):
+            chunk = batch[i:i + BATCH_SIZE]
+            texts = [text for text, _ in chunk]
+            labels = [label for _, label in chunk]
+            vectorized = vectorizer.transform(texts)
+            candidate.partial_fit(vectorized, labels)
+            if candidate_linear is not None:
+                candidate_linear.partial_fit(vectorized, labels)
+
+        texts, labels = holdout
+        baseline = get_baseline_accuracy(model, vectorizer, texts, labels, linear_model)
+        new_accuracy = evaluate_accuracy(candidate, vectorizer, texts, labels, candidate_linear)
+        if new_accuracy < baseline - MAX_ACCURACY_DROP:
+            update_stats["rejected_batches"] += 1
+            update_stats["rejected_examples"] += len(batch)
+            print(f"[WARNING] Rejected feedback update, discarding {len(batch)} examples: "
+                  f"holdout accuracy {new_accuracy:.4f} vs. baseline {baseline:.4f}")
+            return False
+
+        set_active_model(candidate, linear_model=candidate_linear)
+        try:
+            save_model(candidate)
+            if candidate_linear is not None:
+                save_model(candidate_linear, ONLINE_LINEAR_MODEL_FILE)
+        except Exception as e:
+            print(f"[ERROR] Failed to save updated model: {e}")
+
+        update_stats["applied_batches"] += 1
+        update_stats["applied_examples"] += len(batch)
+        update_stats["last_update"] = time.time()
+        update_stats["last_holdout_accuracy"] = new_accuracy
+        print(f"[DEBUG] Applied {len(batch)} feedback examples in {time.time() - start:.2f}s "
+              f"(holdout accuracy: {new_accuracy:.4f})")
+        return True
+
+def run_online_updates():
+    """
+    Continuously apply buffered feedback in a background thread.
+    """
+    while True:
+        time.sleep(UPDATE_INTERVAL)
+        try:
+            apply_pending_feedback(min_batch_size=BATCH_SIZE)
+        except Exception as e:
+            print(f"[ERROR] Online model update failed: {e}")
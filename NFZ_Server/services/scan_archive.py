@@ -0,0 +1,257 @@
+import os
+import csv
+import json
+import time
+import email
+import argparse
+import multiprocessing
+from collections import deque
+from email.header import Header, decode_header, make_header
+
+from services.model import load_model_and_vectorizer, get_linear_model, predict_phishing_batch
+from services.fetch_emails import is_ignored_sender, clean_text, should_ignore_text
+from utils.database import content_id
+
+DEFAULT_BATCH_SIZE = 1000
+# Batches submitted to the pool but not yet written, per worker; bounds memory use
+MAX_PENDING_PER_WORKER = 2
+REPORT_INTERVAL = 10
+
+_model = None
+_vectorizer = None
+_linear_model = None
+
+def iter_archive_files(path):
+    """
+    Yield (kind, path) for every mbox or .eml file under a path, where kind is 'mbox' or 'eml'.
+    """
+    if os.path.isfile(path):
+        yield ('eml' if path.lower().endswith('.eml') else 'mbox'), path
+        return
+
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            lower = name.lower()
+            if lower.endswith('.eml'):
+                yield 'eml', os.path.join(root, name)
+            elif lower.endswith('.mbox'):
+                yield 'mbox', os.path.join(root, name)
+
+def iter_mbox_chunks(file_path):
+    """
+    Yield the raw bytes of each message of an mbox file, reading it line by line so only one
+    message is held in memory. Messages start at 'From ' separator lines, which are dropped.
+    """
+    lines = None
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'From '):
+                if lines is not None:
+                    yield b''.join(lines)
+                lines = []
+            elif lines is not None:
+                lines.append(line)
+    if lines is not None:
+        yield b''.join(lines)
+
+def iter_raw_messages(path):
+    """
+    Stream (source, email.message.Message) pairs out of an archive, one message at a time.
+    """
+    for kind, file_path in iter_archive_files(path):
+        if kind == 'eml':
+            try:
+                with open(file_path, 'rb') as f:
+                    yield file_path, email.message_from_binary_file(f)
+            except Exception as e:
+                print(f"[ERROR] Failed to read {file_path}: {e}")
+            continue
+
+        for index, raw in enumerate(iter_mbox_chunks(file_path)):
+            try:
+                msg = email.message_from_bytes(raw)
+            except Exception as e:
+                print(f"[ERROR] Failed to read message {index} of {file_path}: {e}")
+                continue
+            yield f"{file_path}#{index}", msg
+
+def header_text(msg, name):
+    """
+    Return a header of an archived message as a plain string, or an empty string if it is missing.
+    Encoded words are decoded; headers with raw 8-bit bytes (which the email package returns as
+    Header objects) keep the undecodable bytes as replacement characters.
+    """
+    value = msg.get(name)
+    if value is None:
+        return ""
+    if isinstance(value, Header):
+        return str(value)
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return str(value)
+
+def extract_archived_text(msg):
+    """
+    Extract and clean the text of an archived message, applying the same rules as the Gmail fetcher.
+    Returns an empty string if the message should be ignored.
+    """
+    if is_ignored_sender(header_text(msg, 'From')):
+        return ""
+
+    part = next((p for p in msg.walk() if p.get_content_type() == 'text/plain'), None)
+    if part is None:
+        return ""
+
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return ""
+    try:
+        decoded = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+    except LookupError:
+        # Unknown charset declared by the message
+        decoded = payload.decode('utf-8', errors='replace')
+    decoded = decoded.strip()
+    cleaned = clean_text(decoded)
+    if should_ignore_text(cleaned):
+        return ""
+    return cleaned
+
+def iter_batches(path, batch_size):
+    """
+    Yield (entries, skipped) pairs, where entries holds up to batch_size messages that passed
+    the filters and skipped counts the messages filtered out since the previous batch.
+    A malformed message is logged and counted as skipped instead of ending the scan.
+    """
+    batch = []
+    skipped = 0
+    for source, msg in iter_raw_messages(path):
+        try:
+            text = extract_archived_text(msg)
+            if not text.strip():
+                skipped += 1
+                continue
+
+            entry = {
+                'id': header_text(msg, 'Message-ID') or content_id(text),
+                'source': source,
+                'sender': header_text(msg, 'From'),
+                'subject': header_text(msg, 'Subject'),
+                'message': text,
+            }
+        except Exception as e:
+            print(f"[ERROR] Skipping malformed message {source}: {e}")
+            skipped += 1
+            continue
+
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch, skipped
+            batch = []
+            skipped = 0
+
+    if batch or skipped:
+        yield batch, skipped
+
+def _init_worker():
+    """
+    Load the model once per worker process.
+    """
+    global _model, _vectorizer, _linear_model
+    _model, _vectorizer = load_model_and_vectorizer()
+    _linear_model = get_linear_model()
+
+def _classify_batch(texts):
+    """
+    Classify a batch of texts in a worker process.
+    """
+    if not texts:
+        return []
+    predictions = predict_phishing_batch(_model, _vectorizer, texts, _linear_model)
+    return ["phishing" if int(p) == 1 else "not_phishing" for p in predictions]
+
+class ResultWriter:
+    """
+    Writes scan results incrementally as JSON lines or CSV rows.
+    """
+    FIELDS = ['id', 'source', 'sender', 'subject', 'message', 'result']
+
+    def __init__(self, path, fmt):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=self.FIELDS)
+            self._csv.writeheader()
+
+    def write(self, entries):
+        for entry in entries:
+            if self._csv:
+                self._csv.writerow(entry)
+            else:
+                self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def scan_archive(path, output, fmt='jsonl', workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Classify every message of an mbox file or a directory of mbox/.eml files across a process pool.
+    At most MAX_PENDING_PER_WORKER batches per worker are held in memory at any time,
+    so memory use does not depend on the size of the archive.
+    Returns a dict with the number of scanned, skipped and phishing messages.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * MAX_PENDING_PER_WORKER
+    stats = {'scanned': 0, 'skipped': 0, 'phishing': 0}
+    writer = ResultWriter(output, fmt)
+    pending = deque()
+    start = last_report = time.time()
+
+    def write_oldest():
+        nonlocal last_report
+        entries, result = pending.popleft()
+        for entry, label in zip(entries, result.get()):
+            entry['result'] = label
+            stats['phishing'] += label == 'phishing'
+        writer.write(entries)
+        stats['scanned'] += len(entries)
+
+        now = time.time()
+        if now - last_report >= REPORT_INTERVAL:
+            last_report = now
+            print(f"[DEBUG] {stats['scanned']} messages scanned "
+                  f"({stats['scanned'] / (now - start):.0f} msg/s), {stats['skipped']} skipped.")
+
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for entries, skipped in iter_batches(path, batch_size):
+                stats['skipped'] += skipped
+                texts = [entry['message'] for entry in entries]
+                pending.append((entries, pool.apply_async(_classify_batch, (texts,))))
+                if len(pending) >= max_pending:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    print(f"[DEBUG] Done: {stats['scanned']} messages scanned in {elapsed:.1f}s "
+          f"({stats['scanned'] / max(elapsed, 1e-9):.0f} msg/s), {stats['skipped']} skipped, "
+          f"{stats['phishing']} phishing.")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan an mbox file or a directory of mbox/.eml files for phishing.")
+    parser.add_argument("path", help="mbox file, .eml file or directory containing them")
+    parser.add_argument("-o", "--output", required=True, help="file to write the results to")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="output format (default: guessed from the output file extension)")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes (default: CPU count)")
+    parser.add_argument("-b", "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="messages classified per batch")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    scan_archive(args.path, args.output, fmt, args.workers, args.batch_size)
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+
+from utils.admission import BoundedExecutor, Overloaded, RateLimited, RateLimiter, SingleFlight, TokenBucket
+
+def test_token_bucket_reports_wait_when_empty():
+    bucket = TokenBucket(rate=0.5, capacity=2)
+
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(2, abs=0.01)
+
+def test_rate_limiter_returns_user_token_when_global_limit_rejects():
+    limiter = RateLimiter(user_rate=0.001, user_capacity=2, global_rate=0.001, global_capacity=1)
+
+    assert limiter.check("alice") == 0
+    assert limiter.check("alice") > 0
+    # The global rejection must not have cost alice her second token
+    assert limiter._buckets["alice"].tokens == pytest.approx(1, abs=0.01)
+
+def test_single_flight_coalesces_calls_and_takes_one_token():
+    release = threading.Event()
+    limiter = RateLimiter(user_rate=0.001, user_capacity=1, global_rate=0.001, global_capacity=10)
+    flights = SingleFlight(BoundedExecutor(max_workers=1, max_queued=0), limiter)
+
+    first = flights.submit("alice", release.wait)
+    assert flights.submit("alice", release.wait) is first
+
+    release.set()
+    first.result(timeout=5)
+    with pytest.raises(RateLimited):
+        flights.submit("alice", release.wait)
+
+def test_single_flight_refunds_tokens_when_overloaded():
+    release = threading.Event()
+    limiter = RateLimiter(user_rate=0.001, user_capacity=1, global_rate=0.001, global_capacity=2)
+    flights = SingleFlight(BoundedExecutor(max_workers=1, max_queued=0), limiter)
+
+    busy = flights.submit("alice", release.wait)
+    with pytest.raises(Overloaded):
+        flights.submit("bob", release.wait)
+
+    release.set()
+    busy.result(timeout=5)
+    # bob's user token and the global token were given back, so bob can start a call
+    flights.submit("bob", lambda: None).result(timeout=5)
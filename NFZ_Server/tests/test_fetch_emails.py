@@ -0,0 +1,67 @@
+import base64
+
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+
+import services.fetch_emails as fetch_emails
+from utils.store import IdSets, UserStore
+
+class FakeRequest:
+    def __init__(self, result):
+        self._result = result
+
+    def execute(self):
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+class FakeGmail:
+    """
+    Minimal stand-in for the Gmail service: 'messages' maps IDs to a payload or an exception.
+    """
+
+    def __init__(self, messages):
+        self.messages_by_id = messages
+        self.downloads = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, maxResults):
+        return FakeRequest({'messages': [{'id': msg_id} for msg_id in self.messages_by_id]})
+
+    def get(self, userId, id, format):
+        self.downloads.append(id)
+        return FakeRequest(self.messages_by_id[id])
+
+def gmail_message(sender, body):
+    data = base64.urlsafe_b64encode(body.encode()).decode()
+    return {'payload': {'headers': [{'name': 'From', 'value': sender}], 'body': {'data': data}}}
+
+@pytest.fixture
+def fresh_stores(monkeypatch):
+    monkeypatch.setattr(fetch_emails, "messages", UserStore('test_emails', 10, 100, 3600))
+    monkeypatch.setattr(fetch_emails, "_skipped_ids", IdSets('test_skipped', 10, 10, 100))
+    monkeypatch.setattr(fetch_emails, "classify_local_message", lambda text: "not_phishing")
+
+def test_failed_download_is_retried_and_filtered_message_is_not(fresh_stores):
+    service = FakeGmail({
+        'ok': gmail_message('alice@example.com', 'see you soon'),
+        'filtered': gmail_message('no-reply@example.com', 'automated notice'),
+        'broken': RuntimeError('429 Too Many Requests'),
+    })
+
+    new_messages = fetch_emails.fetch_new_messages(service, 'user')
+    assert [record.id for record in new_messages] == ['ok']
+    assert fetch_emails._skipped_ids.contains('user', 'filtered')
+    assert not fetch_emails._skipped_ids.contains('user', 'broken')
+
+    service.downloads.clear()
+    fetch_emails.fetch_new_messages(service, 'user')
+    assert service.downloads == ['broken']
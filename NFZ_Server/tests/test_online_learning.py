@@ -0,0 +1,92 @@
+import os
+import pickle
+
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("pandas")
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.neural_network import MLPClassifier
+
+import services.model as model
+import services.online_learning as online_learning
+
+TEXTS = [
+    "win a free prize now", "claim your cash reward", "urgent verify your account",
+    "you won a lottery click here", "see you at lunch", "meeting moved to monday",
+    "thanks for the notes", "call me when you are home",
+]
+LABELS = [1, 1, 1, 1, 0, 0, 0, 0]
+
+@pytest.fixture
+def trained_models(tmp_path, monkeypatch):
+    """
+    Train tiny models into a temporary models/ directory and reset the cached state.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("models")
+
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(TEXTS)
+    mlp = MLPClassifier(hidden_layer_sizes=(5,), max_iter=500, random_state=42).fit(X, LABELS)
+    linear = SGDClassifier(loss="log_loss", random_state=42).fit(X, LABELS)
+    for path, obj in ((model.MODEL_FILE, mlp), (model.VECTORIZER_FILE, vectorizer),
+                      (model.LINEAR_MODEL_FILE, linear)):
+        with open(path, "wb") as f:
+            pickle.dump(obj, f)
+
+    monkeypatch.setattr(model, "_active_model", None)
+    monkeypatch.setattr(model, "_active_vectorizer", None)
+    monkeypatch.setattr(model, "_linear_model", None)
+    monkeypatch.setattr(model, "_linear_loaded", False)
+    monkeypatch.setattr(online_learning, "_feedback_buffer", [])
+    monkeypatch.setattr(online_learning, "update_stats", dict(online_learning.update_stats,
+                                                              rejected_examples=0,
+                                                              applied_examples=0,
+                                                              baseline_holdout_accuracy=None))
+    return mlp
+
+def save_holdout():
+    with open(model.HOLDOUT_FILE, "wb") as f:
+        pickle.dump((TEXTS, LABELS), f)
+
+def test_feedback_is_discarded_without_holdout(trained_models):
+    online_learning.record_feedback("see you at lunch", 0)
+    active_before, _ = model.get_active_model()
+
+    assert online_learning.apply_pending_feedback() is False
+    assert model.get_active_model()[0] is active_before
+    assert online_learning.update_stats["rejected_examples"] == 1
+    assert online_learning.pending_feedback_count() == 0
+    assert not os.path.exists(model.ONLINE_MODEL_FILE)
+
+def test_validated_feedback_is_swapped_in_and_trained_model_kept(trained_models):
+    save_holdout()
+    with open(model.MODEL_FILE, "rb") as f:
+        trained_bytes = f.read()
+    online_learning.record_feedback("meeting moved to monday", 0)
+    active_before, _ = model.get_active_model()
+
+    assert online_learning.apply_pending_feedback() is True
+    assert model.get_active_model()[0] is not active_before
+    assert os.path.exists(model.ONLINE_MODEL_FILE)
+    assert os.path.exists(model.ONLINE_LINEAR_MODEL_FILE)
+    with open(model.MODEL_FILE, "rb") as f:
+        assert f.read() == trained_bytes
+
+    model.restore_trained_model()
+    assert not os.path.exists(model.ONLINE_MODEL_FILE)
+
+def test_candidate_below_baseline_is_rejected(trained_models):
+    save_holdout()
+    # No model can reach this baseline, so every candidate is too far below it
+    model.save_baseline_accuracy(1.5)
+    online_learning.record_feedback("win a free prize now", 1)
+    active_before, _ = model.get_active_model()
+
+    assert online_learning.apply_pending_feedback() is False
+    assert model.get_active_model()[0] is active_before
+    assert online_learning.update_stats["rejected_examples"] == 1
+    assert not os.path.exists(model.ONLINE_MODEL_FILE)
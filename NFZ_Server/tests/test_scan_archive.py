@@ -0,0 +1,82 @@
+import mailbox
+
+import pytest
+
+# scan_archive imports the model and Gmail modules, which need the server's dependencies
+for module in ("sklearn", "pandas", "googleapiclient", "google_auth_oauthlib"):
+    pytest.importorskip(module)
+
+from services.scan_archive import extract_archived_text, header_text, iter_batches, iter_raw_messages
+
+MALFORMED = (
+    b"From: J\xc3\xb6rg <jorg@example.com>\n"
+    b"Subject: Gr\xc3\xbc\xc3\x9fe\n"
+    b"Content-Type: text/plain; charset=x-bogus\n"
+    b"\n"
+    b"You won a prize, claim it now\n"
+)
+
+WELL_FORMED = (
+    b"From: Alice <alice@example.com>\n"
+    b"Subject: =?utf-8?q?caf=C3=A9?=\n"
+    b"Message-ID: <1@example.com>\n"
+    b"Content-Type: text/plain; charset=utf-8\n"
+    b"\n"
+    b"See you tomorrow\n"
+)
+
+def write_mbox(path, raw_messages):
+    box = mailbox.mbox(str(path))
+    for raw in raw_messages:
+        box.add(raw)
+    box.flush()
+    box.close()
+
+def test_non_ascii_header_and_unknown_charset(tmp_path):
+    write_mbox(tmp_path / "archive.mbox", [MALFORMED])
+    batches = list(iter_batches(str(tmp_path / "archive.mbox"), batch_size=10))
+
+    assert len(batches) == 1
+    entries, skipped = batches[0]
+    assert skipped == 0
+    assert entries[0]["message"] == "you won a prize claim it now"
+    assert isinstance(entries[0]["sender"], str)
+    assert isinstance(entries[0]["subject"], str)
+    assert entries[0]["sender"].endswith("<jorg@example.com>")
+
+def test_encoded_words_are_decoded(tmp_path):
+    write_mbox(tmp_path / "archive.mbox", [WELL_FORMED])
+    (msg,) = mailbox.mbox(str(tmp_path / "archive.mbox"))
+
+    assert header_text(msg, "Subject") == "café"
+    assert header_text(msg, "Missing") == ""
+    assert extract_archived_text(msg) == "see you tomorrow"
+
+def test_malformed_message_is_skipped_not_fatal(tmp_path, monkeypatch):
+    import services.scan_archive as scan_archive
+
+    def broken(msg):
+        if "alice" in header_text(msg, "From"):
+            raise ValueError("broken message")
+        return extract_archived_text(msg)
+
+    monkeypatch.setattr(scan_archive, "extract_archived_text", broken)
+    write_mbox(tmp_path / "archive.mbox", [WELL_FORMED, MALFORMED])
+    batches = list(scan_archive.iter_batches(str(tmp_path / "archive.mbox"), batch_size=10))
+
+    entries = [entry for batch, _ in batches for entry in batch]
+    assert sum(skipped for _, skipped in batches) == 1
+    assert [entry["message"] for entry in entries] == ["you won a prize claim it now"]
+
+def test_mbox_is_streamed_message_by_message(tmp_path):
+    path = tmp_path / "archive.mbox"
+    write_mbox(path, [WELL_FORMED, MALFORMED, b"From: bob@example.com\n\nFrom the team, hello\n"])
+
+    sources, messages = zip(*iter_raw_messages(str(path)))
+
+    assert sources == (f"{path}#0", f"{path}#1", f"{path}#2")
+    assert header_text(messages[0], "Subject") == "café"
+    assert extract_archived_text(messages[0]) == "see you tomorrow"
+    assert extract_archived_text(messages[1]) == "you won a prize claim it now"
+    # The writer escapes body lines starting with 'From ', so they do not split the message
+    assert "hello" in extract_archived_text(messages[2])
@@ -0,0 +1,65 @@
+import pytest
+
+from utils.store import EmailRecord, IdSets, UserStore
+
+def test_user_store_evicts_oldest_and_reports_evictions():
+    evicted = []
+    store = UserStore('test_store', 2, 3, 60, on_evict=lambda username, item_id: evicted.append((username, item_id)))
+
+    for item_id in ("a", "b", "c"):
+        store.put("alice", item_id, EmailRecord(item_id, "text", "not_phishing"))
+    store.put("bob", "d", EmailRecord("d", "text", "not_phishing"))
+    store.put("bob", "e", EmailRecord("e", "text", "not_phishing"))
+
+    # "a" exceeded alice's limit, then "b" was the oldest when the total limit was exceeded
+    assert evicted == [("alice", "a"), ("alice", "b")]
+    assert [record.id for record in store.values("alice")] == ["c"]
+    assert len(store) == 3
+
+    # Popped and replaced records are not evictions
+    store.pop("bob", "d")
+    store.put("alice", "c", EmailRecord("c", "new text", "not_phishing"))
+    assert len(evicted) == 2
+
+def test_user_store_evicts_expired_records():
+    evicted = []
+    store = UserStore('test_store', 10, 10, 60, on_evict=lambda username, item_id: evicted.append(item_id))
+    old = EmailRecord("old", "text", "not_phishing")
+    old.created -= 120
+    store.put("alice", "old", old)
+    store.put("alice", "new", EmailRecord("new", "text", "not_phishing"))
+
+    assert store.evict_expired() == 1
+    assert evicted == ["old"]
+    assert not store.contains("alice", "old")
+    assert store.contains("alice", "new")
+
+def test_evicted_email_is_not_downloaded_again(monkeypatch):
+    fetch_emails = pytest.importorskip("services.fetch_emails")
+    monkeypatch.setattr(fetch_emails, "_skipped_ids", IdSets('test_skipped', 10, 10, 100))
+    monkeypatch.setattr(fetch_emails, "messages", UserStore('test_emails', 1, 10, 60, on_evict=fetch_emails._skip_evicted))
+
+    fetch_emails.messages.put("alice", "a", EmailRecord("a", "text", "not_phishing"))
+    fetch_emails.messages.put("alice", "b", EmailRecord("b", "text", "not_phishing"))
+
+    assert fetch_emails._skipped_ids.contains("alice", "a")
+    assert not fetch_emails._skipped_ids.contains("alice", "b")
+
+def test_id_sets_are_bounded_per_user_by_users_and_in_total():
+    ids = IdSets('test_ids', 2, 2, 3)
+
+    for item_id in ("a", "b", "c"):
+        ids.add("alice", item_id)
+    assert not ids.contains("alice", "a")
+    assert ids.contains("alice", "c")
+
+    ids.add("bob", "x")
+    ids.add("bob", "y")
+    # Over the total limit, the oldest ID overall is dropped
+    assert not ids.contains("alice", "b")
+    assert len(ids) == 3
+
+    # A third user evicts the user whose IDs changed least recently
+    ids.add("carol", "z")
+    assert not ids.contains("alice", "c")
+    assert ids.contains("bob", "x") and ids.contains("carol", "z")
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import utils.tombstones as tombstones
+from utils.store import IdSets
+
+@pytest.fixture
+def fresh_tombstones(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("config")
+    monkeypatch.setattr(tombstones, "_tombstones", IdSets('test_tombstones', 3, 10, 100))
+    monkeypatch.setattr(tombstones, "_log_lines", 0)
+
+def test_importing_does_not_create_the_log(fresh_tombstones):
+    assert not os.path.exists(tombstones.TOMBSTONES_FILE)
+
+def test_tombstones_are_appended_and_reloaded(fresh_tombstones, monkeypatch):
+    for item_id in ("a", "b", "c", "d"):
+        tombstones.add_tombstone("user", item_id)
+    tombstones.add_tombstone("user", tombstones.text_tombstone_id("hello\nworld"))
+
+    with open(tombstones.TOMBSTONES_FILE) as f:
+        assert len(f.readlines()) == 5
+
+    monkeypatch.setattr(tombstones, "_tombstones", IdSets('test_tombstones', 3, 10, 100))
+    tombstones.load_tombstones()
+
+    # Only the 3 most recent IDs of the user are kept, and the log is compacted to them
+    assert not tombstones.is_tombstoned("user", "b")
+    assert tombstones.is_tombstoned("user", "d")
+    assert tombstones.is_tombstoned("user", tombstones.text_tombstone_id("hello world"))
+    with open(tombstones.TOMBSTONES_FILE) as f:
+        assert len(f.readlines()) == 3
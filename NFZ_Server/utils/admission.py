@@ -0,0 +1,188 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import request, jsonify
+
+class Overloaded(Exception):
+    """
+    Raised when a bounded executor has no room left for another call.
+    """
+
+class RateLimited(Exception):
+    """
+    Raised when a rate limiter rejects a call; retry_after is the number of seconds to wait.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket refilled at 'rate' tokens per second, holding at most 'capacity' tokens.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token. Returns 0 on success, or the number of seconds until a token is available.
+        Must be called with the owning limiter's lock held.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """
+    Per-user token buckets combined with one global bucket shared by all users.
+    Only the most recently seen MAX_USERS users keep a bucket.
+    """
+    MAX_USERS = 10000
+
+    def __init__(self, user_rate, user_capacity, global_rate, global_capacity):
+        self.user_rate = user_rate
+        self.user_capacity = user_capacity
+        self._global = TokenBucket(global_rate, global_capacity)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, username):
+        """
+        Take a token for a user. Returns 0 if the call is allowed, or the seconds to wait before retrying.
+        """
+        with self._lock:
+            bucket = self._buckets.pop(username, None) or TokenBucket(self.user_rate, self.user_capacity)
+            self._buckets[username] = bucket
+            if len(self._buckets) > self.MAX_USERS:
+                self._buckets.popitem(last=False)
+
+            retry_after = bucket.take()
+            if retry_after:
+                return retry_after
+            retry_after = self._global.take()
+            if retry_after:
+                # The global limit rejected the call, so give the user their token back
+                bucket.tokens += 1
+            return retry_after
+
+    def refund(self, username):
+        """
+        Give back the tokens taken by an allowed check() whose call could not be started.
+        """
+        with self._lock:
+            bucket = self._buckets.get(username)
+            if bucket is not None:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+            self._global.tokens = min(self._global.capacity, self._global.tokens + 1)
+
+class BoundedExecutor:
+    """
+    Thread pool that runs at most 'max_workers' calls at once and queues at most 'max_queued' more.
+    Calls beyond that are rejected with Overloaded instead of piling up.
+    """
+
+    def __init__(self, max_workers, max_queued):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule a call and return its Future, or raise Overloaded if the executor is saturated.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single call on a bounded executor.
+    If a rate limiter is given, a token for the key is only taken when a new call starts,
+    so callers joining an in-flight call are never rate limited.
+    """
+
+    def __init__(self, executor, limiter=None):
+        self._executor = executor
+        self._limiter = limiter
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Return the Future of the in-flight call for 'key', starting one if there is none.
+        Raises RateLimited if a new call is needed but the key is out of tokens,
+        and Overloaded if the executor is saturated.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if self._limiter is not None:
+                retry_after = self._limiter.check(key)
+                if retry_after:
+                    raise RateLimited(retry_after)
+            try:
+                future = self._executor.submit(fn, *args, **kwargs)
+            except Overloaded:
+                # No call was started, so the key should not pay for it
+                if self._limiter is not None:
+                    self._limiter.refund(key)
+                raise
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+def too_many_requests(retry_after, message="Too many requests"):
+    """
+    Build a 429 response telling the client how many seconds to wait.
+    """
+    response = jsonify({"status": "error", "message": message})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, 429
+
+def overloaded(retry_after=1):
+    """
+    Build a 503 response used when the server sheds load.
+    """
+    response = jsonify({"status": "error", "message": "Server is busy, try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 503
+
+def rate_limited(limiter):
+    """
+    Decorate a route so each call takes a token for the requesting user, answering 429 when none is left.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True) or {}
+            username = data.get("username") or request.args.get("username") or request.remote_addr
+            retry_after = limiter.check(username)
+            if retry_after:
+                return too_many_requests(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
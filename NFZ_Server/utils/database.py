@@ -1,6 +1,13 @@
 import json
+import hashlib
 from datetime import datetime
 
+def content_id(text):
+    """
+    Return a stable ID for a piece of text, used for items that have no ID of their own.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
 def store_email_for_user(username, email_data):
     """
     Store an email for a specific user in a JSON file.
@@ -0,0 +1,315 @@
+import sys
+import time
+import threading
+from collections import OrderedDict, deque
+
+EVICTION_INTERVAL = 300
+
+# Every store registers itself here so it can be evicted and reported on in one place
+stores = {}
+
+class Record:
+    """
+    Base class for compact stored items.
+    Subclasses list their public fields in __slots__; 'created' is only used for retention.
+    """
+    __slots__ = ('created',)
+
+    def to_dict(self):
+        """
+        Return the public fields of the record as a dict for JSON responses.
+        """
+        return {name: getattr(self, name) for name in type(self).__slots__}
+
+    def size(self):
+        """
+        Estimate the memory used by the record and the values it holds, in bytes.
+        """
+        names = Record.__slots__ + type(self).__slots__
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in names)
+
+class MessageRecord(Record):
+    __slots__ = ('id', 'text', 'timestamp', 'label')
+
+    def __init__(self, id, text, timestamp, label):
+        self.id = id
+        self.text = text
+        self.timestamp = timestamp
+        self.label = label
+        self.created = timestamp
+
+class EmailRecord(Record):
+    __slots__ = ('id', 'message', 'result')
+
+    def __init__(self, id, message, result):
+        self.id = id
+        self.message = message
+        self.result = result
+        self.created = time.time()
+
+class ChatRecord(Record):
+    __slots__ = ('username', 'message', 'timestamp')
+
+    def __init__(self, username, message, timestamp):
+        self.username = username
+        self.message = message
+        self.timestamp = timestamp
+        self.created = time.time()
+
+class AlertRecord(Record):
+    __slots__ = ('username', 'message')
+
+    def __init__(self, username, message):
+        self.username = username
+        self.message = message
+        self.created = time.time()
+
+class UserStore:
+    """
+    Per-user records keyed by item ID, bounded per user, in total and by age.
+    The oldest records are evicted first, and on_evict(username, item_id) is called for each
+    evicted record, but not for records that are replaced or popped.
+    """
+
+    def __init__(self, name, max_per_user, max_total, max_age, on_evict=None):
+        self.max_per_user = max_per_user
+        self.max_total = max_total
+        self.max_age = max_age
+        self.on_evict = on_evict
+        self._items = {}
+        # (username, item_id) of every record, oldest first
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+        stores[name] = self
+
+    def __len__(self):
+        return len(self._order)
+
+    def put(self, username, item_id, record):
+        """
+        Store a record, replacing any record with the same ID, and enforce the count limits.
+        """
+        with self._lock:
+            self._remove(username, item_id)
+            self._items.setdefault(username, OrderedDict())[item_id] = record
+            self._order[(username, item_id)] = None
+
+            user_items = self._items[username]
+            while len(user_items) > self.max_per_user:
+                self._evict(username, next(iter(user_items)))
+            while len(self._order) > self.max_total:
+                self._evict(*next(iter(self._order)))
+
+    def get(self, username, item_id):
+        """
+        Return a stored record, or None if it does not exist.
+        """
+        return self._items.get(username, {}).get(item_id)
+
+    def contains(self, username, item_id):
+        """
+        Check whether a record is stored for a user.
+        """
+        return item_id in self._items.get(username, {})
+
+    def pop(self, username, item_id):
+        """
+        Remove and return a stored record, or None if it does not exist.
+        """
+        with self._lock:
+            return self._remove(username, item_id)
+
+    def values(self, username):
+        """
+        Return a snapshot of all records of a user, oldest first.
+        """
+        with self._lock:
+            return list(self._items.get(username, {}).values())
+
+    def evict_expired(self, now=None):
+        """
+        Remove records older than max_age and return how many were removed.
+        """
+        cutoff = (now or time.time()) - self.max_age
+        removed = 0
+        with self._lock:
+            while self._order:
+                username, item_id = next(iter(self._order))
+                if self._items[username][item_id].created >= cutoff:
+                    break
+                self._evict(username, item_id)
+                removed += 1
+        return removed
+
+    def memory_usage(self):
+        """
+        Estimate the memory used by the store, in bytes.
+        """
+        with self._lock:
+            records = [record for user_items in self._items.values() for record in user_items.values()]
+            containers = sys.getsizeof(self._items) + sys.getsizeof(self._order)
+            containers += sum(sys.getsizeof(user_items) for user_items in self._items.values())
+        return {
+            "users": len(self._items),
+            "items": len(records),
+            "bytes": containers + sum(record.size() for record in records),
+        }
+
+    def _evict(self, username, item_id):
+        self._remove(username, item_id)
+        if self.on_evict is not None:
+            self.on_evict(username, item_id)
+
+    def _remove(self, username, item_id):
+        user_items = self._items.get(username)
+        if user_items is None or item_id not in user_items:
+            return None
+        record = user_items.pop(item_id)
+        del self._order[(username, item_id)]
+        if not user_items:
+            del self._items[username]
+        return record
+
+class IdSets:
+    """
+    Per-user sets of item IDs, bounded per user, in total and by the number of users.
+    The oldest IDs, and the users whose IDs changed least recently, are evicted first.
+    """
+
+    def __init__(self, name, max_per_user, max_users, max_total):
+        self.max_per_user = max_per_user
+        self.max_users = max_users
+        self.max_total = max_total
+        # username -> IDs of that user, oldest first; users ordered by last change
+        self._sets = OrderedDict()
+        # (username, item_id) of every ID, oldest first
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+        stores[name] = self
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._order))
+
+    def add(self, username, item_id):
+        """
+        Add an ID for a user, or mark it as the most recent if it is already there,
+        and enforce the limits.
+        """
+        with self._lock:
+            ids = self._sets.pop(username, None)
+            if ids is None:
+                ids = OrderedDict()
+            self._sets[username] = ids
+            ids.pop(item_id, None)
+            ids[item_id] = None
+            self._order.pop((username, item_id), None)
+            self._order[(username, item_id)] = None
+
+            while len(ids) > self.max_per_user:
+                self._remove(username, next(iter(ids)))
+            while len(self._sets) > self.max_users:
+                oldest_user = next(iter(self._sets))
+                for oldest_id in list(self._sets[oldest_user]):
+                    self._remove(oldest_user, oldest_id)
+            while len(self._order) > self.max_total:
+                self._remove(*next(iter(self._order)))
+
+    def contains(self, username, item_id):
+        """
+        Check whether an ID is stored for a user.
+        """
+        ids = self._sets.get(username)
+        return ids is not None and item_id in ids
+
+    def evict_expired(self, now=None):
+        """
+        IDs do not expire, they are only bounded by count.
+        """
+        return 0
+
+    def memory_usage(self):
+        """
+        Estimate the memory used by the sets, in bytes.
+        """
+        with self._lock:
+            keys = list(self._order)
+            containers = sys.getsizeof(self._sets) + sys.getsizeof(self._order)
+            containers += sum(sys.getsizeof(ids) for ids in self._sets.values())
+        return {
+            "users": len(self._sets),
+            "items": len(keys),
+            "bytes": containers + sum(sys.getsizeof(k) + sys.getsizeof(k[1]) for k in keys),
+        }
+
+    def _remove(self, username, item_id):
+        del self._order[(username, item_id)]
+        ids = self._sets[username]
+        del ids[item_id]
+        if not ids:
+            del self._sets[username]
+
+class RecordList:
+    """
+    Records kept in arrival order, bounded by count and by age.
+    """
+
+    def __init__(self, name, max_items, max_age):
+        self.max_age = max_age
+        self._items = deque(maxlen=max_items)
+        self._lock = threading.Lock()
+        stores[name] = self
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items))
+
+    def append(self, record):
+        """
+        Add a record, dropping the oldest one if the list is full.
+        """
+        with self._lock:
+            self._items.append(record)
+
+    def evict_expired(self, now=None):
+        """
+        Remove records older than max_age and return how many were removed.
+        """
+        cutoff = (now or time.time()) - self.max_age
+        removed = 0
+        with self._lock:
+            while self._items and self._items[0].created < cutoff:
+                self._items.popleft()
+                removed += 1
+        return removed
+
+    def memory_usage(self):
+        """
+        Estimate the memory used by the list, in bytes.
+        """
+        with self._lock:
+            records = list(self._items)
+        return {
+            "items": len(records),
+            "bytes": sys.getsizeof(self._items) + sum(record.size() for record in records),
+        }
+
+def evict_expired_periodically():
+    """
+    Continuously evict expired records from every store in a background thread.
+    """
+    while True:
+        time.sleep(EVICTION_INTERVAL)
+        for name, store in list(stores.items()):
+            try:
+                removed = store.evict_expired()
+                if removed:
+                    print(f"[DEBUG] Evicted {removed} expired items from {name}.")
+            except Exception as e:
+                print(f"[ERROR] Eviction failed for {name}: {e}")
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+
+from utils.database import content_id
+from utils.store import IdSets
+
+# Deleted IDs are appended one JSON line at a time, so a delete never rewrites the whole file.
+# The log is compacted on load and whenever it holds COMPACT_RATIO times more lines than live IDs.
+# Only the server loads it (see load_tombstones), so importing this module never touches the file.
+TOMBSTONES_FILE = 'config/tombstones.log'
+MAX_TOMBSTONES_PER_USER = 5000
+MAX_TOMBSTONES_TOTAL = 100000
+MAX_TOMBSTONE_USERS = 10000
+COMPACT_RATIO = 2
+MIN_COMPACT_LINES = 1000
+
+_tombstones = IdSets('tombstones', MAX_TOMBSTONES_PER_USER, MAX_TOMBSTONE_USERS, MAX_TOMBSTONES_TOTAL)
+# Serializes writes to the log file
+_lock = threading.Lock()
+_log_lines = 0
+
+def compact_tombstones():
+    """
+    Rewrite the log so it only holds the live tombstones.
+    Must be called with the lock held.
+    """
+    global _log_lines
+    tmp_path = TOMBSTONES_FILE + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            for username, item_id in _tombstones:
+                f.write(json.dumps([username, item_id]) + '\n')
+        os.replace(tmp_path, TOMBSTONES_FILE)
+        _log_lines = len(_tombstones)
+    except OSError as e:
+        print(f"[ERROR] Failed to compact tombstones: {e}")
+
+def load_tombstones():
+    """
+    Load the deleted item IDs of every user from the log file and compact it.
+    """
+    with _lock:
+        if os.path.exists(TOMBSTONES_FILE):
+            try:
+                with open(TOMBSTONES_FILE, 'r') as f:
+                    for line in f:
+                        try:
+                            username, item_id = json.loads(line)
+                        except ValueError:
+                            # A crash can leave a partially written last line behind
+                            continue
+                        _tombstones.add(username, item_id)
+            except OSError as e:
+                print(f"[ERROR] Failed to load tombstones: {e}")
+        compact_tombstones()
+
+def add_tombstone(username, item_id):
+    """
+    Mark an item as deleted for a user so it is never fetched or shown again.
+    Only the most recent MAX_TOMBSTONES_PER_USER IDs per user, MAX_TOMBSTONES_TOTAL IDs
+    overall and MAX_TOMBSTONE_USERS users are kept.
+    """
+    global _log_lines
+    with _lock:
+        _tombstones.add(username, item_id)
+        try:
+            with open(TOMBSTONES_FILE, 'a') as f:
+                f.write(json.dumps([username, item_id]) + '\n')
+            _log_lines += 1
+        except OSError as e:
+            print(f"[ERROR] Failed to save tombstone: {e}")
+
+        if _log_lines > max(COMPACT_RATIO * len(_tombstones), MIN_COMPACT_LINES):
+            compact_tombstones()
+
+def text_tombstone_id(text):
+    """
+    Return the tombstone ID used for an item deleted by its text, before its real ID was known.
+    Line breaks are collapsed so texts sent back by clients match the stored ones.
+    """
+    return 'text:' + content_id(text.replace('\n', ' ').replace('\r', ' ').strip())
+
+def is_tombstoned(username, item_id):
+    """
+    Check whether an item was deleted by a user.
+    """
+    return _tombstones.contains(username, item_id)